@@ -14,6 +14,8 @@ DEFAULT_HISTORY_MAX = 12
 from pathlib import Path
 from datetime import datetime, timedelta
 import math as m
+from functools import lru_cache
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from matplotlib.widgets import Slider, Button, RadioButtons  # type: ignore
@@ -21,6 +23,8 @@ from matplotlib.widgets import Slider, Button, RadioButtons  # type: ignore
 
 AN_HOUR = timedelta(hours=1)
 A_DAY = timedelta(days=1)
+AN_HOUR_S = int(AN_HOUR.total_seconds())
+A_DAY_S = int(A_DAY.total_seconds())
 
 
 # %% Prepare data
@@ -65,33 +69,32 @@ else:
 
     data_file = choose_file()
 
-with open(data_file, 'r') as file:
-    data = file.read()
-
-data_sheet = [ line.split('\t') for line in data.splitlines() ]
-data_sheet = [
-    [
-        int(line[0]),    # Unix time
-        float(line[1]),  # Charge percentage
-        line[2]          # Charge status
-    ] for line in data_sheet
-]
+data_sheet = np.loadtxt(
+    data_file, delimiter='\t', encoding='utf-8',
+    usecols=(0, 1, 2), dtype=[
+        ('t', np.int64),    # Unix time
+        ('c', np.float32),  # Charge percentage
+        ('s', 'U32')        # Charge status
+    ], ndmin=1
+)
 
-# Remove 'unknown' status
-data_sheet = [ line for line in data_sheet if line[2] != 'unknown' ]
-timeline, charge_data = tuple(zip(*data_sheet))[:2]
+# Select contiguous columns, removing 'unknown' status
+known = data_sheet['s'] != 'unknown'
+timeline = data_sheet['t'][known]
+charge_data = data_sheet['c'][known]
+status_last = data_sheet['s'][np.flatnonzero(known)[-1]]
+del data_sheet, known
 current_charge = charge_data[-1]
 
 # Compressed timeline
-MAX_GAP = .2 * AN_HOUR.total_seconds()
-timeline_zipped = list(timeline)
-for idx in range(1, len(timeline_zipped)):
-    delta = timeline_zipped[idx] - timeline_zipped[idx - 1]
-    if delta > MAX_GAP:
-        timeline_zipped[:idx] = [
-            timestamp + delta - MAX_GAP
-            for timestamp in timeline_zipped[:idx]
-        ]
+MAX_GAP = .2 * AN_HOUR_S
+# every point is shifted by the excess of all the gaps after it
+gap_excess = np.clip(np.diff(timeline) - MAX_GAP, 0, None)
+gap_shift = np.concatenate(([0], np.cumsum(gap_excess)))
+timeline_zipped = timeline + (gap_shift[-1] - gap_shift)
+
+# Both timelines are sorted if the history is, which is the usual case
+timeline_sorted = bool((timeline[1:] >= timeline[:-1]).all())
 
 print('### Data prepared, plotting ...')
 
@@ -147,62 +150,80 @@ def timestamp_now():
 
 
 TICK_INTERVAL = timedelta(minutes=5)
+TICK_S = int(TICK_INTERVAL.total_seconds())
+UPDATE_INTERVAL = 33  # in milliseconds
+
+
+@lru_cache(maxsize=64)
+def major_ticks_offsets(minute_min, minute_max, t_days, relative):
+    """ major tick offsets from the origin, i.e. the midnight before the
+        range or the present if `relative`, for a range given in whole
+        minutes from the origin; cached so that slider noise within the
+        same minute hits the cache
+    """
+    range_min, range_max = minute_min * 60, minute_max * 60
+
+    step = TICK_S * (-1 if relative else 1)
+    offsets = step * np.arange((t_days + 1) * A_DAY_S // TICK_S)
+    offsets = offsets[(range_min <= offsets) & (offsets <= range_max)]
+    offsets.flags.writeable = False  # shared by the cache
+    return offsets
 
 
 def ticks_format(
     range_min, range_max,
     compress=True,
-    relative=True
+    relative=True,
+    now_ts=None
 ):
-    t_min, t_max = [
-        datetime.fromtimestamp(t)
-        for t in (range_min, range_max)
-    ]
-    t_delta = t_max - t_min
-    t_days = m.ceil(t_delta / A_DAY) + 1
+    t_days = m.ceil((range_max - range_min) / A_DAY_S) + 1
     # +1 day to compensate for rollback to midnight
+    base_midnight = midnight_timestamp(range_min)
+
+    if now_ts is None:
+        now_ts = timestamp_now()
+    origin = now_ts if relative else base_midnight
+    ticks = origin + major_ticks_offsets(
+        m.floor((range_min - origin) / 60),
+        m.ceil((range_max - origin) / 60),
+        t_days, relative
+    )
+    ax.xaxis.set_major_locator(ticker.FixedLocator(
+        ticks[(range_min <= ticks) & (ticks < range_max)],
+        nbins=12
+    ))  # show date at 0:00
+
+    # Local time of day, by arithmetic if the UTC offset is fixed
+    utc_offsets = {
+        datetime.fromtimestamp(t).astimezone().utcoffset()
+        for t in (range_min, range_max)
+    }
+    if len(utc_offsets) == 1:
+        utc_offset = utc_offsets.pop().total_seconds()  # type: ignore
 
-    def date_loc(count):
-        return (
-            midnight_timestamp(range_min)
-            + (A_DAY * count).total_seconds()
-        )
-
-    def time_loc(count):
-        return (
-            midnight_timestamp(range_min)
-            + (TICK_INTERVAL * count).total_seconds()
-        ) if not relative else (
-            timestamp_now()
-            - (TICK_INTERVAL * count).total_seconds()
-        )  # relative timestamp
-
-    ax.xaxis.set_major_locator(ticker.FixedLocator([
-        time_loc(count)
-        for count in range(
-            round((t_days + 1) * (A_DAY / TICK_INTERVAL))
-        )
-        if range_min < time_loc(count) < range_max
-    ], nbins=12))  # show date at 0:00
+        def time_label(timestamp):
+            hours, seconds = divmod(
+                int(timestamp + utc_offset) % A_DAY_S, AN_HOUR_S
+            )
+            return f'{hours}:{seconds // 60:02d}'
+    else:  # DST change within the range
+        def time_label(timestamp):
+            return datetime.fromtimestamp(timestamp).strftime('%-H:%M')
 
     ax.xaxis.set_major_formatter(ticker.FuncFormatter(
-        lambda timestamp, pos:
-        datetime.fromtimestamp(timestamp).strftime(
-            '%-H:%M'
-        ) if not relative else "{:.1f}".format(
-            (datetime.fromtimestamp(timestamp) - datetime.now())
-            / AN_HOUR
+        lambda timestamp, pos, now_ts=now_ts:
+        time_label(timestamp) if not relative else "{:.1f}".format(
+            (timestamp - now_ts) / AN_HOUR_S
         )
     ))
 
     if compress:
         ax.xaxis.set_minor_locator(ticker.NullLocator())
     else:
-        ax.xaxis.set_minor_locator(ticker.FixedLocator([
-            date_loc(count)
-            for count in range(t_days + 1)
-            if range_min <= date_loc(count) <= range_max
-        ]))  # show date at 0:00 midnight
+        dates = base_midnight + A_DAY_S * np.arange(t_days + 1)
+        ax.xaxis.set_minor_locator(ticker.FixedLocator(
+            dates[(range_min <= dates) & (dates <= range_max)]
+        ))  # show date at 0:00 midnight
 
         ax.xaxis.set_minor_formatter(ticker.FuncFormatter(
             lambda timestamp, pos:
@@ -215,6 +236,19 @@ def ticks_format(
         plt.setp(ax.xaxis.get_minorticklabels(), position=(0, +.085))
 
 
+def is_monotonic(data):
+    first, last = data[0], data[-1]
+    lowest, highest = data.min(), data.max()
+
+    # Monotonic data is bounded by its endpoints
+    if first <= last:
+        return lowest == first and highest == last \
+            and bool((data[1:] >= data[:-1]).all())
+    else:
+        return lowest == last and highest == first \
+            and bool((data[1:] <= data[:-1]).all())
+
+
 class BatteryStat(object):
     def __init__(self):
         slider_history_max.on_changed(self.update)
@@ -227,6 +261,45 @@ class BatteryStat(object):
         self.compress = True
         self.relative = True
 
+        # Artists, reused across updates
+        self._scatter = ax.scatter([], [], s=8)
+        self._trend, = ax.plot(
+            [], [],
+            linewidth=.5,
+            dashes=[24, 8],
+            color='grey'
+        )
+
+        # Fixed axis limits, nothing is autoscaled
+        ax.set_autoscale_on(False)
+        ax.set_ylim(0, 100)
+
+        # Coalesce bursts of widget events, e.g. a slider drag
+        self._options = {}
+        self._timer = fig.canvas.new_timer(interval=UPDATE_INTERVAL)
+        self._timer.single_shot = True
+        self._timer.add_callback(self._do_update)
+
+        # Last plot spec, to skip redundant redraws
+        self._last_key = (
+            self.compress, self.relative,
+            DEFAULT_HISTORY_MIN, DEFAULT_HISTORY_MAX
+        )
+
+        # Blit the sliders while dragging, the full figure is only
+        # redrawn once the update is processed
+        self._sliders = [slider_history_max, slider_history_min]
+        self._background = None
+        self._canvas = fig.canvas  # swapped out during `savefig`
+        self._blit = self._canvas.supports_blit
+        if self._blit:
+            for slider in self._sliders:
+                slider.drawon = False
+                slider.ax.set_animated(True)
+            self._canvas.mpl_connect('draw_event', self._on_draw)
+        self._canvas.mpl_connect('resize_event', self._on_resize)
+        ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
         self.format()
 
     def format(
@@ -239,9 +312,6 @@ class BatteryStat(object):
             DEFAULT_HISTORY_MAX
         )  # in hours
     ):
-        # Clear graph
-        ax.clear()
-
         self.ticks_format = ticks_format
         options = {
             'compress': compress,
@@ -251,56 +321,53 @@ class BatteryStat(object):
             if value is not None:
                 setattr(self, key, value)
 
-        # Time in seconds
+        # Time in seconds, with the present fixed for this update
+        self.now_ts = timestamp_now()
         if self.compress:
             timeline_local = timeline_zipped
             now = timeline_local[-1]
         else:
             timeline_local = timeline
-            now = timestamp_now()
+            now = self.now_ts
 
         t_end, t_start = [
-            now - timedelta(hours=hours).total_seconds()
+            now - hours * AN_HOUR_S
             for hours in min_max_history
         ]
         # Set plot range
         self.plot_range = [t_start, t_end]
-        ax.set_xlim(self.plot_range)  # type: ignore
+        ax.set_xlim(self.plot_range, emit=False)  # type: ignore
 
         # New data
-        new_data = [
-            [ time, charge_data[idx] ]
-            for idx, time in enumerate(timeline_local)
-            if t_start <= time <= t_end
-        ]
-        if not new_data:
-            self.timeline = self.charge_data = []
+        if timeline_sorted:
+            idx_start = np.searchsorted(timeline_local, t_start, 'left')
+            idx_end = np.searchsorted(timeline_local, t_end, 'right')
+            window = slice(idx_start, idx_end)
         else:
-            self.timeline, self.charge_data = list(zip(*new_data))
+            window = (t_start <= timeline_local) & (timeline_local <= t_end)
+        self.timeline = timeline_local[window]
+        self.charge_data = charge_data[window]
 
     def analyze(self):
         timeline, charge_data = self.timeline, self.charge_data
 
-        if len(timeline) <= 2 or not all(
-            x <= y for x, y in zip(charge_data, charge_data[1:])
-        ) and not all(
-            x >= y for x, y in zip(charge_data, charge_data[1:])
-        ):  # not monotonic data
+        if len(timeline) <= 2 or not is_monotonic(charge_data):
             self._set_title(
                 'Charge Data\n'
                 '[select monotonic domain for statistics]'
             )
+            self._trend.set_data([], [])
             return
 
         # Time range in hours
-        t_range = (timeline[-1] - timeline[0]) / AN_HOUR.total_seconds()
+        t_range = (timeline[-1] - timeline[0]) / AN_HOUR_S
 
         # Statistics
         rate = (charge_data[-1] - charge_data[0]) / t_range
         life = BATTERY_MAX_CHARGE / abs(rate)
         full_life = 100. / abs(rate)
 
-        status = data_sheet[-1][-1]
+        status = status_last
         if status == 'discharging':
             left = current_charge / abs(rate)
         elif status == 'charging':
@@ -331,12 +398,9 @@ class BatteryStat(object):
         )
 
     def _plot_trend(self):
-        ax.plot(
+        self._trend.set_data(
             *[ [ pts[0], pts[-1] ]
-               for pts in [self.timeline, self.charge_data] ],
-            linewidth=.5,
-            dashes=[24, 8],
-            color='grey'
+               for pts in [self.timeline, self.charge_data] ]
         )
 
     def graph(self):
@@ -344,21 +408,35 @@ class BatteryStat(object):
         self.ticks_format(
             *self.plot_range,
             compress=self.compress,
-            relative=self.relative
-        )
-        ax.scatter(
-            self.timeline, self.charge_data,
-            s=8
+            relative=self.relative,
+            now_ts=self.now_ts
         )
+        self._scatter.set_offsets(self._plot_points())
 
-    def update(self, value):
-        min_history = - slider_history_min.val
-        max_history = - slider_history_max.val
-        if min_history >= max_history:
-            max_history = min_history + .1
-            slider_history_max.set_val(-max_history)
+    def _plot_points(self):
+        """ points to draw, at most a min / max pair per pixel column """
+        timeline, charge_data = self.timeline, self.charge_data
+        columns = int(ax.bbox.width)
+        if len(timeline) <= 2 * columns:
+            return np.c_[timeline, charge_data]
+
+        # Bin the sorted timeline into pixel columns
+        bins = np.linspace(*ax.get_xlim(), columns + 1)
+        column_idx = np.searchsorted(bins, timeline, 'right')
+        starts = np.flatnonzero(np.diff(column_idx, prepend=-1))
+        return np.r_[
+            np.c_[
+                timeline[starts],
+                np.minimum.reduceat(charge_data, starts)
+            ],
+            np.c_[
+                timeline[starts],
+                np.maximum.reduceat(charge_data, starts)
+            ]
+        ]
 
-        options = {}
+    def update(self, value):
+        options = self._options
 
         if value == 'Compressed':
             options.update({
@@ -375,6 +453,29 @@ class BatteryStat(object):
                 'compress': False,
                 'relative': False
             })
+        if not isinstance(value, str):  # slider moved
+            self._blit_sliders()
+
+        # Restart the timer, only the last update is processed
+        self._timer.stop()
+        self._timer.start()
+
+    def _do_update(self):
+        min_history = - slider_history_min.val
+        max_history = - slider_history_max.val
+        if min_history >= max_history:
+            max_history = min_history + .1
+            slider_history_max.set_val(-max_history)
+
+        options, self._options = self._options, {}
+        key = (
+            options.get('compress', self.compress),
+            options.get('relative', self.relative),
+            round(min_history, 3), round(max_history, 3)
+        )
+        if key == self._last_key:
+            return
+        self._last_key = key
 
         self.format(
             min_max_history=(min_history, max_history),
@@ -383,6 +484,36 @@ class BatteryStat(object):
         self.graph()
         fig.canvas.draw_idle()
 
+    def _on_draw(self, event):
+        canvas = self._canvas
+
+        # Only on-screen draws give the background, not `savefig`
+        if event.canvas is canvas and not canvas.is_saving() \
+                and event.renderer.get_canvas_width_height() \
+                == canvas.get_width_height(physical=True):
+            self._background = canvas.copy_from_bbox(fig.bbox)
+        for slider in self._sliders:
+            slider.ax.draw(event.renderer)
+
+    def _on_resize(self, event):
+        self._background = None
+        self._scatter.set_offsets(self._plot_points())
+
+    def _on_xlim_changed(self, axes):
+        # Zoom and pan from the toolbar, bypassing `format`
+        self._scatter.set_offsets(self._plot_points())
+
+    def _blit_sliders(self):
+        if not self._blit:
+            return
+        if self._background is None:
+            self._canvas.draw_idle()
+            return
+        self._canvas.restore_region(self._background)
+        for slider in self._sliders:
+            fig.draw_artist(slider.ax)
+        self._canvas.blit(fig.bbox)
+
     def reset(self, event):
         slider_history_max.reset()
         slider_history_min.reset()